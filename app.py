@@ -1,17 +1,6 @@
 import streamlit as st
 import os
 from core import analyze_folder
-import base64
-from PIL import Image
-
-def load_image(image_path):
-    """加载图片并转换为 base64"""
-    try:
-        with open(image_path, "rb") as f:
-            return base64.b64encode(f.read()).decode()
-    except Exception as e:
-        st.error(f"无法加载图片: {e}")
-        return None
 
 def main():
     st.set_page_config(
@@ -51,7 +40,7 @@ def main():
                         with col1:
                             st.metric("总照片数", total_photos)
                         with col2:
-                            if focal_lengths:
+                            if len(focal_lengths):
                                 st.metric("焦距中位数", f"{focal_length_median:.1f}mm")
                         with col3:
                             st.metric("日均照片数", f"{daily_average:.1f}")
@@ -71,8 +60,8 @@ def main():
                             chart_path = os.path.join(output_dir, filename)
                             if os.path.exists(chart_path):
                                 st.subheader(title)
-                                img = Image.open(chart_path)
-                                st.image(img, use_column_width=True)
+                                # st.image 直接按路径发送文件字节，带 ETag 缓存
+                                st.image(chart_path, use_container_width=True)
                             else:
                                 st.warning(f"未能找到{title}图表")
                                 
@@ -1,46 +1,155 @@
+import functools
+import io
 import os
-import re
 import math  # 新增：用于判断 nan
-from datetime import datetime
+import pickle
+import sqlite3
+import concurrent.futures
+from collections import Counter
+from datetime import date, datetime
 import matplotlib.pyplot as plt
 import matplotlib.font_manager as fm
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
 from PIL import Image
-from PIL.ExifTags import TAGS
 import numpy as np
 from tqdm import tqdm
 
+try:
+    import exifread
+except ImportError:  # 未安装 exifread 时全部走 Pillow
+    exifread = None
+
+# 支持的图片扩展名
+_EXTS = ('.jpg', '.jpeg', '.png', '.bmp', '.tiff')
+
+# 只读取文件头：EXIF(APP1) 段几乎总是位于文件最前面的 128KB 内
+_EXIF_HEAD_SIZE = 131072
+
+# 下游用到的 5 个 EXIF 标签 ID（Pillow 回退路径只查这 5 个）
+_PIL_TAG_IDS = {
+    'FocalLength': 0x920A,
+    'DateTimeOriginal': 0x9003,
+    'ISOSpeedRatings': 0x8827,
+    'FNumber': 0x829D,
+    'ExposureTime': 0x829A,
+}
+
+# exifread 标签名 -> 原有的 Pillow 风格键名
+_EXIFREAD_TAGS = {
+    'EXIF FocalLength': 'FocalLength',
+    'EXIF DateTimeOriginal': 'DateTimeOriginal',
+    'EXIF ISOSpeedRatings': 'ISOSpeedRatings',
+    'EXIF FNumber': 'FNumber',
+    'EXIF ExposureTime': 'ExposureTime',
+}
+
+# 字体只需配置一次；streamlit 每次点击都会调用 analyze_folder
+_FONTS_CONFIGURED = False
+
 def configure_matplotlib_fonts():
+    global _FONTS_CONFIGURED
+    if _FONTS_CONFIGURED:
+        return
     plt.rcParams['font.family'] = 'sans-serif'
     plt.rcParams['font.sans-serif'] = ['Microsoft YaHei', 'SimHei', 'Noto Sans CJK SC']
     plt.rcParams['axes.unicode_minus'] = False
+    _FONTS_CONFIGURED = True
+
+# 导入时即完成配置，后续调用直接跳过
+configure_matplotlib_fonts()
+
+def _exifread_value(tag):
+    """把 exifread 的标签值转换成原有 Pillow 风格的值"""
+    values = tag.values
+    if isinstance(values, (list, tuple)) and values:
+        value = values[0]
+        if isinstance(value, exifread.utils.Ratio):
+            return (value.num, value.den)
+        return value
+    return values
+
+def _read_head(image_path):
+    """读入文件头；POSIX 上用单次 pread，其他平台（Windows）用带缓冲读取"""
+    if hasattr(os, 'pread'):
+        fd = os.open(image_path, os.O_RDONLY)
+        try:
+            return os.pread(fd, _EXIF_HEAD_SIZE, 0)
+        finally:
+            os.close(fd)
+    with open(image_path, 'rb') as f:
+        return f.read(_EXIF_HEAD_SIZE)
+
+def _exif_from_file(fobj):
+    """用 exifread 解析 EXIF，stop_tag 保证只读到需要的最后一个标签"""
+    tags = exifread.process_file(fobj, details=False, stop_tag='FocalLength')
+    return {name: _exifread_value(tags[key])
+            for key, name in _EXIFREAD_TAGS.items() if key in tags}
 
 def get_exif_data(image_path):
     """提取图片的 EXIF 信息"""
     try:
+        # 主路径：exifread 只解析 EXIF 段，不解码图片本身
+        if exifread is not None:
+            try:
+                head = _read_head(image_path)
+                # JPEG 的 APP1 段位于文件头内时，直接在内存缓冲上解析
+                if head[:2] == b'\xff\xd8' and b'\xff\xe1' in head:
+                    exif_data = _exif_from_file(io.BytesIO(head))
+                else:
+                    with open(image_path, 'rb') as f:
+                        exif_data = _exif_from_file(f)
+                if exif_data:
+                    return exif_data
+            except Exception:
+                pass  # exifread 解析失败则回退到 Pillow
+
+        # 回退路径：exifread 不可用或没有解析出标签
         image = Image.open(image_path)
-        exif_data = image._getexif()
-        if not exif_data:
+        exif = image.getexif()
+        if not exif:
             return {}
 
-        return {TAGS.get(tag, tag): value for tag, value in exif_data.items()}
+        # 只查需要的 5 个标签，不遍历全部标签，也不解析 MakerNote/缩略图
+        exif_ifd = exif.get_ifd(0x8769)
+        exif_data = {}
+        for name, tag_id in _PIL_TAG_IDS.items():
+            value = exif_ifd.get(tag_id, exif.get(tag_id))
+            if value is not None:
+                exif_data[name] = value
+        return exif_data
     except Exception as e:
         print(f"Error in get_exif_data('{image_path}'): {e}")
         return {}
 
+@functools.lru_cache(maxsize=4096)
+def _rational(value):
+    """把 EXIF 数值（标量或 (分子, 分母) 元组）转换成 float；nan 和除零返回 None
+
+    EXIF 数值（如 f/2.8、1/250）在同一批照片里大量重复，lru_cache
+    可以把重复值的 isinstance/isnan 检查降为一次字典查找。
+    """
+    if isinstance(value, tuple):
+        # 检查各项是否为 nan
+        if any(isinstance(v, (float, int)) and math.isnan(v) for v in value):
+            return None
+        if value[1] == 0:
+            return None  # 防止除零错误
+        return float(value[0]) / float(value[1])
+    # 判断数值是否为 nan
+    if isinstance(value, (float, int)) and math.isnan(value):
+        return None
+    return float(value)
+
 def process_focal_length(focal_length):
     """处理焦段数据"""
     try:
-        # 判断数值是否为 nan
-        if isinstance(focal_length, (float, int)) and math.isnan(focal_length):
+        value = _rational(focal_length)
+        if value is None:
             return None
-        if isinstance(focal_length, tuple):
-            # 检查各项是否为 nan
-            if any(isinstance(v, (float, int)) and math.isnan(v) for v in focal_length):
-                return None
-            if focal_length[1] == 0:
-                return None  # 防止除零错误
-            return round(float(focal_length[0]) / float(focal_length[1]))
-        return round(float(focal_length))
+        focal = round(value)
+        # 过滤损坏的有理数和 65535 占位值，真实镜头焦距都在此范围内
+        return focal if 0 < focal < 65535 else None
     except Exception as e:
         print(f"Error in process_focal_length({focal_length}): {e}")
         return None
@@ -62,15 +171,8 @@ def process_iso_value(iso_value):
 def process_aperture(aperture):
     """处理光圈数据"""
     try:
-        if isinstance(aperture, (float, int)) and math.isnan(aperture):
-            return None
-        if isinstance(aperture, tuple):
-            if any(isinstance(v, (float, int)) and math.isnan(v) for v in aperture):
-                return None
-            if aperture[1] == 0:
-                return None  # 防止除零错误
-            return round(float(aperture[0]) / float(aperture[1]), 1)
-        return round(float(aperture), 1)
+        value = _rational(aperture)
+        return round(value, 1) if value is not None else None
     except Exception as e:
         print(f"Error in process_aperture({aperture}): {e}")
         return None
@@ -78,17 +180,8 @@ def process_aperture(aperture):
 def process_shutter_speed(shutter_speed):
     """处理快门速度数据"""
     try:
-        if isinstance(shutter_speed, (float, int)) and math.isnan(shutter_speed):
-            return None
-        if isinstance(shutter_speed, tuple):
-            if any(isinstance(v, (float, int)) and math.isnan(v) for v in shutter_speed):
-                return None
-            if shutter_speed[1] == 0:
-                return None  # 防止除零错误
-            speed = float(shutter_speed[0]) / float(shutter_speed[1])
-        else:
-            speed = float(shutter_speed)
-        return round(speed, 4)
+        value = _rational(shutter_speed)
+        return round(value, 4) if value is not None else None
     except Exception as e:
         print(f"Error in process_shutter_speed({shutter_speed}): {e}")
         return None
@@ -116,109 +209,204 @@ def try_parse_date(date_string):
             continue
     return None
 
+# EXIF 解析结果的持久化缓存位置
+_EXIF_CACHE_FILE = os.path.join('output', '.exif_cache.sqlite')
+
+# 区分「缓存未命中」与「缓存了 None 结果」的哨兵值
+_CACHE_MISS = object()
+
+class _ExifCache:
+    """以 (路径, 修改时间, 大小) 为键的持久化 EXIF 解析结果缓存
+
+    同一文件夹重复分析时，未修改过的图片直接命中缓存，完全跳过文件读取。
+    """
+
+    def __init__(self, cache_path=_EXIF_CACHE_FILE):
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        self._conn = sqlite3.connect(cache_path)
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS exif_cache ('
+            'path TEXT PRIMARY KEY, mtime REAL, size INTEGER, result BLOB)')
+
+    def get(self, path, mtime, size):
+        row = self._conn.execute(
+            'SELECT mtime, size, result FROM exif_cache WHERE path = ?',
+            (path,)).fetchone()
+        if row and row[0] == mtime and row[1] == size:
+            return pickle.loads(row[2])
+        return _CACHE_MISS
+
+    def put(self, path, mtime, size, result):
+        self._conn.execute(
+            'INSERT OR REPLACE INTO exif_cache VALUES (?, ?, ?, ?)',
+            (path, mtime, size, pickle.dumps(result)))
+
+    def close(self):
+        self._conn.commit()
+        self._conn.close()
+
+def _iter_images(folder_path):
+    """惰性遍历文件夹下的所有图片路径，边遍历边交给进程池处理"""
+    for root, _, files in os.walk(folder_path):
+        for file in files:
+            if file.lower().endswith(_EXTS):
+                yield os.path.join(root, file)
+
+def _pool_init():
+    """子进程初始化：关闭 Pillow 的大图像素限制，避免大图被拒绝解析"""
+    Image.MAX_IMAGE_PIXELS = None
+
+def _extract_one(image_path):
+    """提取单张图片的关键参数，返回一个小字典（在进程池中执行）"""
+    exif_data = get_exif_data(image_path)
+    if not exif_data:
+        return None
+
+    result = {'fl': None, 'date': None, 'hour': None,
+              'iso': None, 'ap': None, 'ss': None}
+
+    # 处理焦段数据
+    if 'FocalLength' in exif_data:
+        result['fl'] = process_focal_length(exif_data['FocalLength'])
+
+    # 处理拍摄日期：整张图片只解析一次，日期用整数序数表示
+    dt = try_parse_date(exif_data.get('DateTimeOriginal'))
+    if dt:
+        result['date'] = dt.toordinal()
+        result['hour'] = dt.hour
+
+    # 处理 ISO / 光圈 / 快门速度数据
+    if 'ISOSpeedRatings' in exif_data:
+        result['iso'] = process_iso_value(exif_data['ISOSpeedRatings'])
+    if 'FNumber' in exif_data:
+        result['ap'] = process_aperture(exif_data['FNumber'])
+    if 'ExposureTime' in exif_data:
+        result['ss'] = process_shutter_speed(exif_data['ExposureTime'])
+
+    # 所有字段都没解析出来的图片（截图、处理过的 JPEG 等）直接丢弃
+    if all(value is None for value in result.values()):
+        return None
+
+    return result
+
+def _counts_to_dict(counts, scale=1):
+    """把 np.bincount 的结果转换回 {值: 数量} 字典（跳过计数为 0 的桶）"""
+    nonzero = np.nonzero(counts)[0]
+    if scale == 1:
+        return {int(k): int(counts[k]) for k in nonzero}
+    return {round(int(k) / scale, 1): int(counts[k]) for k in nonzero}
+
+def _group_by_hour(hour_list, value_list):
+    """按小时 (0-23) 把数值分成 24 个桶，返回桶列表"""
+    hour_arr = np.asarray(hour_list, dtype=np.int64)
+    value_arr = np.asarray(value_list)
+    boundaries = np.cumsum(np.bincount(hour_arr, minlength=24))[:-1]
+    order = np.argsort(hour_arr, kind='stable')
+    return np.split(value_arr[order], boundaries)
+
 def process_folder(folder_path):
     """处理文件夹中的图片并统计数据"""
-    focal_lengths = []
-    dates = {}
-    hours = {}
-    iso = {}
-    apertures = {}
-    shutter_speeds = {}
+    results = []
+
+    cache = _ExifCache()
+    cached_results = []
+    pending = []  # 未命中缓存的 (路径, 修改时间, 大小)，与 executor.map 的结果顺序一致
+
+    def uncached_images():
+        """遍历图片路径：命中缓存的直接记下结果，其余交给进程池"""
+        for image_path in _iter_images(folder_path):
+            try:
+                st = os.stat(image_path)
+            except OSError:
+                continue  # 文件在遍历和 stat 之间被删除/改名，跳过
+            cached = cache.get(image_path, st.st_mtime, st.st_size)
+            if cached is not _CACHE_MISS:
+                cached_results.append(cached)
+            else:
+                pending.append((image_path, st.st_mtime, st.st_size))
+                yield image_path
+
+    # 并行提取 EXIF：目录遍历与解析重叠进行，主进程只收集结果
+    try:
+        with concurrent.futures.ProcessPoolExecutor(
+                max_workers=os.cpu_count(), initializer=_pool_init) as executor:
+            for i, result in enumerate(tqdm(executor.map(_extract_one, uncached_images(),
+                                                         chunksize=64),
+                                            desc="处理图片")):
+                cache.put(*pending[i], result)
+                if result:
+                    results.append(result)
+
+        # 命中缓存的图片不经过进程池
+        results.extend(r for r in cached_results if r)
+    finally:
+        cache.close()
+
+    # 一次性把结果转成列式 NumPy 数组（紧凑 dtype，连续内存）
+    focal_lengths = np.fromiter((r['fl'] for r in results if r['fl']),
+                                dtype=np.int32)
+    date_arr = np.fromiter((r['date'] for r in results if r['date'] is not None),
+                           dtype=np.int32)
+    hour_arr = np.fromiter((r['hour'] for r in results if r['date'] is not None),
+                           dtype=np.int64)
+    iso_arr = np.fromiter((r['iso'] for r in results if r['iso']),
+                          dtype=np.uint32)
+    aperture_arr = np.fromiter((r['ap'] for r in results if r['ap']),
+                               dtype=np.float32)
+    shutter_speeds = Counter(r['ss'] for r in results if r['ss'])
+
+    # 每小时参数桶的 (小时, 数值) 平行数组
+    def hourly_columns(key, dtype):
+        pairs = [(r['hour'], r[key]) for r in results
+                 if r[key] and r['hour'] is not None]
+        hours_col = np.fromiter((h for h, _ in pairs), dtype=np.int64, count=len(pairs))
+        values_col = np.fromiter((v for _, v in pairs), dtype=dtype, count=len(pairs))
+        return hours_col, values_col
+
+    # 用 np.bincount / np.unique 一次性完成整数计数，只在边界处转换回字典
+    unique_ords, ord_counts = np.unique(date_arr, return_counts=True)
+    dates = {date.fromordinal(int(o)): int(c)
+             for o, c in zip(unique_ords, ord_counts)}
+    hours = _counts_to_dict(np.bincount(hour_arr, minlength=24))
+    iso = _counts_to_dict(np.bincount(iso_arr.astype(np.int64)))
+    # 光圈已四舍五入到 0.1，放大 10 倍后用整数计数
+    aperture_x10 = np.rint(aperture_arr.astype(np.float64) * 10).astype(np.int64)
+    apertures = _counts_to_dict(np.bincount(aperture_x10), scale=10)
+
+    # 按小时分桶每小时参数
+    iso_buckets = _group_by_hour(*hourly_columns('iso', np.uint32))
+    aperture_buckets = _group_by_hour(*hourly_columns('ap', np.float32))
+    shutter_buckets = _group_by_hour(*hourly_columns('ss', np.float64))
     hourly_settings = {i: {
-        'apertures': [], 
-        'shutter_speeds': [],
-        'isos': []  # 添加ISO数组
+        'apertures': aperture_buckets[i].tolist(),
+        'shutter_speeds': shutter_buckets[i].tolist(),
+        'isos': iso_buckets[i].tolist()
     } for i in range(24)}
 
-    # 获取所有图片文件
-    image_files = []
-    for root, _, files in os.walk(folder_path):
-        image_files.extend(
-            os.path.join(root, file)
-            for file in files
-            if re.match(r'.*\.(jpg|jpeg|png|bmp|tiff)$', file, re.IGNORECASE)
-        )
-
-    # 处理图片文件
-    for image_path in tqdm(image_files, desc="处理图片"):
-        exif_data = get_exif_data(image_path)
-        if not exif_data:
-            continue
-
-        # 处理焦段数据
-        if 'FocalLength' in exif_data:
-            focal_length = process_focal_length(exif_data['FocalLength'])
-            if focal_length:
-                focal_lengths.append(focal_length)
-
-        # 处理拍摄日期
-        if 'DateTimeOriginal' in exif_data:
-            raw_date = exif_data['DateTimeOriginal']
-            dt = try_parse_date(raw_date)
-            if dt:
-                dates[dt.date()] = dates.get(dt.date(), 0) + 1
-                hours[dt.hour] = hours.get(dt.hour, 0) + 1
-
-        # 处理 ISO 数据
-        if 'ISOSpeedRatings' in exif_data:
-            iso_value = process_iso_value(exif_data['ISOSpeedRatings'])
-            if iso_value:
-                iso[iso_value] = iso.get(iso_value, 0) + 1
-                if 'DateTimeOriginal' in exif_data:
-                    try:
-                        dt = datetime.strptime(exif_data['DateTimeOriginal'], '%Y:%m:%d %H:%M:%S')
-                        hourly_settings[dt.hour]['isos'].append(iso_value)
-                    except ValueError as e:
-                        print(f"Error parsing DateTimeOriginal for ISO in '{image_path}': {e}")
-                        pass
-
-        # 处理光圈数据
-        if 'FNumber' in exif_data:
-            aperture = process_aperture(exif_data['FNumber'])
-            if aperture:
-                apertures[aperture] = apertures.get(aperture, 0) + 1
-                if 'DateTimeOriginal' in exif_data:
-                    try:
-                        dt = datetime.strptime(exif_data['DateTimeOriginal'], '%Y:%m:%d %H:%M:%S')
-                        hourly_settings[dt.hour]['apertures'].append(aperture)
-                    except ValueError as e:
-                        print(f"Error parsing DateTimeOriginal for FNumber in '{image_path}': {e}")
-                        pass
-
-        # 处理快门速度数据
-        if 'ExposureTime' in exif_data:
-            shutter_speed = process_shutter_speed(exif_data['ExposureTime'])
-            if shutter_speed:
-                shutter_speeds[shutter_speed] = shutter_speeds.get(shutter_speed, 0) + 1
-                if 'DateTimeOriginal' in exif_data:
-                    try:
-                        dt = datetime.strptime(exif_data['DateTimeOriginal'], '%Y:%m:%d %H:%M:%S')
-                        hourly_settings[dt.hour]['shutter_speeds'].append(shutter_speed)
-                    except ValueError as e:
-                        print(f"Error parsing DateTimeOriginal for ExposureTime in '{image_path}': {e}")
-                        pass
-
     return focal_lengths, dates, hours, iso, apertures, shutter_speeds, hourly_settings
 
 def generate_chart(data, title, x_label, y_label, output_file):
-    """生成统计图表"""
-    plt.figure(figsize=(12, 7))
-    
+    """生成统计图表（使用 Figure API，不依赖 pyplot 全局状态，线程安全）"""
+    fig = Figure(figsize=(12, 7))
+    FigureCanvasAgg(fig)
+    ax = fig.subplots()
+
     if isinstance(data, dict):
         if not data:
-            plt.text(0.5, 0.5, '没有数据', 
+            ax.text(0.5, 0.5, '没有数据',
                     ha='center', va='center',
-                    transform=plt.gca().transAxes,
+                    transform=ax.transAxes,
                     fontsize=14)
         else:
             sorted_data = sorted(data.items())
             keys, values = zip(*sorted_data)
-            
-            plt.bar(range(len(keys)), values, color='skyblue', alpha=0.7)
-            
+
+            ax.bar(range(len(keys)), values, color='skyblue', alpha=0.7)
+
             # 设置x轴标签
             if keys and isinstance(keys[0], type(datetime.now().date())):
-                plt.xticks(range(len(keys)), [k.strftime('%Y-%m-%d') for k in keys], rotation=45)
+                ax.set_xticks(range(len(keys)))
+                ax.set_xticklabels([k.strftime('%Y-%m-%d') for k in keys], rotation=45)
             else:
                 # 特殊处理快门速度的显示
                 if title.startswith('快门速度'):
@@ -228,89 +416,84 @@ def generate_chart(data, title, x_label, y_label, output_file):
                             formatted_labels.append(f'1/{int(1/k)}')
                         else:
                             formatted_labels.append(f'{k:.1f}')
-                    
+
                     # 设置适当的标签间隔
                     if len(keys) > 20:
                         step = len(keys) // 10  # 只显示约10个标签
-                        plt.xticks(range(0, len(keys), step), 
-                                 [formatted_labels[i] for i in range(0, len(keys), step)],
-                                 rotation=45)
+                        ax.set_xticks(range(0, len(keys), step))
+                        ax.set_xticklabels([formatted_labels[i] for i in range(0, len(keys), step)],
+                                           rotation=45)
                     else:
-                        plt.xticks(range(len(keys)), formatted_labels, rotation=45)
+                        ax.set_xticks(range(len(keys)))
+                        ax.set_xticklabels(formatted_labels, rotation=45)
                 else:
-                    plt.xticks(range(len(keys)), keys, rotation=45 if title.startswith('ISO') else 0)
-                
+                    ax.set_xticks(range(len(keys)))
+                    ax.set_xticklabels(keys, rotation=45 if title.startswith('ISO') else 0)
+
                 if title.startswith('ISO') or title.startswith('快门速度'):
-                    plt.yscale('log')
+                    ax.set_yscale('log')
 
             # 添加数值标签
             max_value = max(values)
             for i, v in enumerate(values):
                 if v > max_value * 0.05:
-                    plt.text(i, v, str(v), ha='center', va='bottom', fontsize=8)
+                    ax.text(i, v, str(v), ha='center', va='bottom', fontsize=8)
     else:
-        if not data:
-            plt.text(0.5, 0.5, '没有数据', 
+        if len(data) == 0:
+            ax.text(0.5, 0.5, '没有数据',
                     ha='center', va='center',
-                    transform=plt.gca().transAxes,
+                    transform=ax.transAxes,
                     fontsize=14)
         else:
             # 处理焦段数据
-            counts, bins, patches = plt.hist(data, bins=20, color='skyblue', alpha=0.7)
-            
-            # 计算每个区间的中点
-            bin_centers = [(bins[i] + bins[i+1])/2 for i in range(len(bins)-1)]
-            
-            # 计算累积分布
-            total_photos = sum(counts)
-            half_photos = total_photos / 2
-            cumsum = 0
-            
-            # 找到照片数量平分点
-            for i, (count, left_edge, right_edge) in enumerate(zip(counts, bins[:-1], bins[1:])):
-                cumsum += count
-                if cumsum >= half_photos:
-                    # 使用线性插值找到更精确的分割点
-                    prev_sum = cumsum - count
-                    ratio = (half_photos - prev_sum) / count
-                    split_point = left_edge + ratio * (right_edge - left_edge)
-                    break
-            
+            counts, bins, patches = ax.hist(data, bins=20, color='skyblue', alpha=0.7)
+
+            # 用累积分布 + searchsorted 找到照片数量平分点
+            cumcounts = np.cumsum(counts)
+            half_photos = cumcounts[-1] / 2
+            idx = int(np.searchsorted(cumcounts, half_photos))
+            prev_sum = cumcounts[idx - 1] if idx > 0 else 0
+
+            # 使用线性插值找到更精确的分割点
+            ratio = (half_photos - prev_sum) / counts[idx]
+            split_point = bins[idx] + ratio * (bins[idx + 1] - bins[idx])
+
             # 添加分割线
-            plt.axvline(x=split_point, color='red', linestyle='--', alpha=0.7)
-            plt.text(split_point, plt.ylim()[1], 
+            ax.axvline(x=split_point, color='red', linestyle='--', alpha=0.7)
+            ax.text(split_point, ax.get_ylim()[1],
                     f'数量中点: {split_point:.1f}mm',
                     rotation=0,
                     ha='right',
                     va='bottom',
                     fontsize=10)
-            
+
             # 添加数值标签
             max_count = max(counts)
             for i in range(len(counts)):
                 if counts[i] > max_count * 0.05:
-                    plt.text((bins[i] + bins[i+1])/2, counts[i], 
-                            f'{int(counts[i])}', 
+                    ax.text((bins[i] + bins[i+1])/2, counts[i],
+                            f'{int(counts[i])}',
                             ha='center', va='bottom', fontsize=8)
-            
-            plt.xticks(bins, [f'{int(x)}' for x in bins], rotation=45)
-    
-    plt.title(title)
-    plt.xlabel(x_label)
-    plt.ylabel(y_label)
-    plt.tight_layout()
-    
+
+            ax.set_xticks(bins)
+            ax.set_xticklabels([f'{int(x)}' for x in bins], rotation=45)
+
+    ax.set_title(title)
+    ax.set_xlabel(x_label)
+    ax.set_ylabel(y_label)
+    fig.tight_layout()
+
     os.makedirs('output', exist_ok=True)
     output_path = os.path.join('output', output_file)
-    plt.savefig(output_path, dpi=300, bbox_inches='tight')
-    plt.close()
+    fig.savefig(output_path, dpi=150, pil_kwargs={'compress_level': 1})
 
 def generate_hourly_settings_chart(hourly_settings, output_file):
-    """生成每小时光圈和快门速度的折线图"""
-    plt.figure(figsize=(15, 8))
-    
+    """生成每小时光圈和快门速度的折线图（Figure API，线程安全）"""
+    fig = Figure(figsize=(15, 8))
+    FigureCanvasAgg(fig)
+
     # 创建三个y轴
-    fig, ax1 = plt.subplots(figsize=(15, 8))
+    ax1 = fig.subplots()
     ax2 = ax1.twinx()
     ax3 = ax1.twinx()  # 创建第三个y轴用于ISO
     
@@ -318,22 +501,21 @@ def generate_hourly_settings_chart(hourly_settings, output_file):
     ax3.spines['right'].set_position(('outward', 60))
 
     hours = range(24)
-    avg_apertures = []
-    avg_shutter_speeds = []
-    avg_isos = []
-
-    for hour in hours:
-        apertures = hourly_settings[hour]['apertures']
-        shutter_speeds = hourly_settings[hour]['shutter_speeds']
-        isos = hourly_settings[hour]['isos']
-        
-        avg_aperture = np.mean(apertures) if apertures else None
-        avg_shutter = np.mean(shutter_speeds) if shutter_speeds else None
-        avg_iso = np.mean(isos) if isos else None
-        
-        avg_apertures.append(avg_aperture)
-        avg_shutter_speeds.append(avg_shutter)
-        avg_isos.append(avg_iso)
+
+    def hourly_means(key):
+        """用加权 bincount 一次算出 24 小时的平均值（空桶为 None）"""
+        buckets = [np.asarray(hourly_settings[h][key], dtype=np.float64)
+                   for h in range(24)]
+        counts = np.array([len(b) for b in buckets], dtype=np.int64)
+        hour_idx = np.repeat(np.arange(24), counts)
+        values = np.concatenate(buckets) if counts.sum() else np.empty(0)
+        sums = np.bincount(hour_idx, weights=values, minlength=24)
+        means = np.divide(sums, counts, out=np.full(24, np.nan), where=counts > 0)
+        return [float(m) if c else None for m, c in zip(means, counts)]
+
+    avg_apertures = hourly_means('apertures')
+    avg_shutter_speeds = hourly_means('shutter_speeds')
+    avg_isos = hourly_means('isos')
 
     # 设置更柔和的颜色
     aperture_color = '#3498db'  # 柔和的蓝色
@@ -425,13 +607,12 @@ def generate_hourly_settings_chart(hourly_settings, output_file):
     labels = [l.get_label() for l in lines]
     ax1.legend(lines, labels, loc='upper right')
 
-    plt.title('每小时平均拍摄参数', pad=20)
-    plt.tight_layout()
-    
+    ax1.set_title('每小时平均拍摄参数', pad=20)
+    fig.tight_layout()
+
     os.makedirs('output', exist_ok=True)
     output_path = os.path.join('output', output_file)
-    plt.savefig(output_path, dpi=300, bbox_inches='tight')
-    plt.close()
+    fig.savefig(output_path, dpi=150, pil_kwargs={'compress_level': 1})
 
 def analyze_folder(folder_path):
     """分析文件夹并返回所有统计数据"""
@@ -457,31 +638,27 @@ def analyze_folder(folder_path):
         (shutter_speeds, '快门速度统计', '快门速度 (秒)', '照片数量', 'shutter_speed_chart.png')
     ]
     
+    # 并行渲染所有图表（Agg 的 PNG 编码会释放 GIL，线程可以并发）
     chart_paths = {}
-    for chart_data in tqdm(charts, desc="生成图表"):
-        data, title, x_label, y_label, filename = chart_data
-        output_path = os.path.join(output_dir, filename)
-        generate_chart(data, title, x_label, y_label, filename)
-        chart_paths[filename] = output_path
-    
-    # 生成每小时设置统计图表
-    hourly_settings_path = os.path.join(output_dir, 'hourly_settings_chart.png')
-    generate_hourly_settings_chart(hourly_settings, 'hourly_settings_chart.png')
-    chart_paths['hourly_settings_chart.png'] = hourly_settings_path
+    with concurrent.futures.ThreadPoolExecutor(max_workers=4) as executor:
+        futures = []
+        for data, title, x_label, y_label, filename in charts:
+            futures.append(executor.submit(generate_chart, data, title, x_label, y_label, filename))
+            chart_paths[filename] = os.path.join(output_dir, filename)
+        # 每小时设置统计图表
+        futures.append(executor.submit(generate_hourly_settings_chart,
+                                       hourly_settings, 'hourly_settings_chart.png'))
+        chart_paths['hourly_settings_chart.png'] = os.path.join(output_dir, 'hourly_settings_chart.png')
+
+        for future in tqdm(concurrent.futures.as_completed(futures),
+                           total=len(futures), desc="生成图表"):
+            future.result()
 
     # 计算额外的统计数据
     total_photos = sum(dates.values())  # 修改：计算所有日期的照片总和
     
-    # 计算焦距中位数
-    valid_focal_lengths = [f for f in focal_lengths if f]
-    focal_length_median = 0
-    if valid_focal_lengths:
-        valid_focal_lengths.sort()
-        mid = len(valid_focal_lengths) // 2
-        if len(valid_focal_lengths) % 2 == 0:
-            focal_length_median = (valid_focal_lengths[mid-1] + valid_focal_lengths[mid]) / 2
-        else:
-            focal_length_median = valid_focal_lengths[mid]
+    # 计算焦距中位数（np.median 在 C 层用选择算法，无需完整排序）
+    focal_length_median = float(np.median(focal_lengths)) if len(focal_lengths) else 0
     
     # 计算日均照片数
     num_days = len(dates)  # 获取拍摄天数